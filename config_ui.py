@@ -1,36 +1,89 @@
+import argparse
 import json
 import os
 
 import logging
 
-from typing import Optional, Dict, Any, List
+from collections import defaultdict
+
+from typing import Optional, Dict, Any, List, DefaultDict, Set
 
 from github_manager import GitHubManager
 
 try:
-  from prompt_toolkit.shortcuts import checkboxlist_dialog, button_dialog, radiolist_dialog
+  import orjson
 except ImportError:
-  raise ImportError("Install prompt_toolkit: pip install prompt_toolkit")
+  orjson = None
+
+
+def _shortcuts() -> Any:
+  """Import prompt_toolkit's dialog shortcuts on first use.
+
+  Returns:
+      module: prompt_toolkit.shortcuts.
+
+  Raises:
+      ImportError: If prompt_toolkit is not installed.
+  """
+  try:
+    from prompt_toolkit import shortcuts
+  except ImportError:
+    raise ImportError("Install prompt_toolkit: pip install prompt_toolkit")
+  return shortcuts
+
 
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+def _dumps(obj: Any) -> bytes:
+  """Serialize obj as indented JSON, using orjson when available."""
+  if orjson is not None:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+  return json.dumps(obj, indent=2).encode('utf-8')
+
+
+def _loads(data: bytes) -> Any:
+  """Deserialize JSON, using orjson when available."""
+  if orjson is not None:
+    return orjson.loads(data)
+  return json.loads(data)
 
 
 class ConfigUi:
   """Configuration UI for managing enabled repositories."""
 
-  def __init__(self, configFilePath: str = 'config.json', appName: str = 'CopilotConfigUI') -> None:
+  def __init__(
+    self, configFilePath: str = 'config.json', appName: str = 'CopilotConfigUI',
+    useCache: bool = True
+  ) -> None:
     """Initialize ConfigUi.
 
     Args:
         configFilePath (str): Path to the config file.
         appName (str): Application name.
+        useCache (bool): Cache GitHub org/repo listings between runs.
     """
     self.configFilePath = configFilePath
     self.appName = appName
-    self.githubManager = GitHubManager()
+    self._useCache = useCache
+    self._githubManager: Optional[GitHubManager] = None
+    self._reposCache: Dict[str, List[str]] = {}
+    self._dirty = False
+    self._username: Optional[str] = None
     self.config = self.loadConfig()
+    self._enabledRepos: DefaultDict[str, Set[str]] = defaultdict(set)
+    for r in self.config['enabled_repos']:
+      self._enabledRepos[r['org']].add(r['repo_name'])
     logging.info(f"Initialized {self.appName} with config file: {self.configFilePath}")
 
+  @property
+  def githubManager(self) -> GitHubManager:
+    """GitHubManager, constructed on first access so gh is only called when needed.
+
+    Returns:
+        GitHubManager: The shared manager instance.
+    """
+    if self._githubManager is None:
+      self._githubManager = GitHubManager(use_cache=self._useCache)
+    return self._githubManager
+
   def loadConfig(self) -> Dict[str, Any]:
     """Load configuration from file or create default config.
 
@@ -42,8 +95,8 @@ class ConfigUi:
       config = {'enabled_repos': []}
       self.saveConfig(config)
     else:
-      with open(self.configFilePath, 'r') as f:
-        config = json.load(f)
+      with open(self.configFilePath, 'rb') as f:
+        config = _loads(f.read())
       if 'enabled_repos' not in config:
         config['enabled_repos'] = []
     return config
@@ -54,44 +107,50 @@ class ConfigUi:
     Args:
         config (dict, optional): Configuration to save. Defaults to self.config.
     """
+    if config is None:
+      self.config['enabled_repos'] = [
+        {'org': org, 'repo_name': repo}
+        for org, repos in self._enabledRepos.items()
+        for repo in sorted(repos)
+      ]
     config = config or self.config
-    with open(self.configFilePath, 'w') as f:
-      json.dump(config, f, indent=2)
+    tmpPath = self.configFilePath + '.tmp'
+    with open(tmpPath, 'wb') as f:
+      f.write(_dumps(config))
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmpPath, self.configFilePath)
     logging.info(f"Saved configuration to {self.configFilePath}")
+    if self._githubManager is not None:
+      self._githubManager.invalidate_cache()
+
+  def _flush(self) -> None:
+    """Save the configuration if it changed since the last save."""
+    if self._dirty:
+      self.saveConfig()
+      self._dirty = False
 
   def run(self) -> None:
-    """Run the top-level menu."""
-    self.topLevelMenu()
+    """Run the top-level menu, saving pending changes however it ends."""
+    try:
+      self.topLevelMenu()
+    finally:
+      self._flush()
 
   def _getAuthenticatedUsername(self) -> str:
-    """Get the authenticated GitHub username.
+    """Get the authenticated GitHub username, resolving it on first use.
 
     Returns:
         str: Authenticated username.
-
-    Raises:
-        AttributeError: If username method/property not found.
     """
-    if hasattr(self.githubManager, 'get_authenticated_username'):
-      return self.githubManager.get_authenticated_username()
-    if hasattr(self.githubManager, 'get_username'):
-      return self.githubManager.get_username()
-    if hasattr(self.githubManager, 'username'):
-      return self.githubManager.username
-    if hasattr(self.githubManager, 'user'):
-      return self.githubManager.user
-    logging.error(
-      "Could not find a method to get the authenticated username in GitHubManager. "
-      "Please implement get_authenticated_username(), get_username(), or a .username property."
-    )
-    raise AttributeError(
-      "GitHubManager object has no method or property for the authenticated username."
-    )
+    if self._username is None:
+      self._username = self.githubManager.get_authenticated_username()
+    return self._username
 
   def topLevelMenu(self) -> None:
     """Display the top-level menu."""
     while True:
-      result = button_dialog(
+      result = _shortcuts().button_dialog(
         title=self.appName,
         text="Select a menu:",
         buttons=[
@@ -111,8 +170,9 @@ class ConfigUi:
     user = self._getAuthenticatedUsername()
     choices: List[tuple] = [(org, org) for org in orgs]
     choices.append((user, user))
+    self._prefetchRepos(orgs + [user])
     while True:
-      result = radiolist_dialog(
+      result = _shortcuts().radiolist_dialog(
         title="GitHub Org & User Menu",
         text="Select an organization or your username:",
         values=choices + [("back", "< Back to Top-Level Menu>")]
@@ -123,18 +183,31 @@ class ConfigUi:
       else:
         self.repositoryMenu(result)
 
+  def _prefetchRepos(self, owners: List[str]) -> None:
+    """Fetch the repository lists of several orgs/users in one batch.
+
+    Args:
+        owners (list): Organization or user names.
+    """
+    missing = [owner for owner in owners if owner not in self._reposCache]
+    if not missing:
+      return
+    logging.info(f"Prefetching repositories for {len(missing)} orgs/users")
+    self._reposCache.update(self.githubManager.get_repos_bulk(missing))
+
   def repositoryMenu(self, orgOrUser: str) -> None:
     """Display the repository enable/disable menu for a selected org/user.
 
     Args:
         orgOrUser (str): Organization or user name.
     """
-    repos = self.githubManager.get_repos(orgOrUser)
-    enabledSet = {(r['org'], r['repo_name']) for r in self.config['enabled_repos']}
+    repos = self._reposCache.get(orgOrUser)
+    if repos is None:
+      repos = self._reposCache[orgOrUser] = self.githubManager.get_repos(orgOrUser)
     while True:
       choices = [(repo, repo) for repo in repos]
-      defaultValues = [repo for repo in repos if (orgOrUser, repo) in enabledSet]
-      result = checkboxlist_dialog(
+      defaultValues = list(self._enabledRepos[orgOrUser] & set(repos))
+      result = _shortcuts().checkboxlist_dialog(
         title=f"Repositories for {orgOrUser}",
         text="Enable/disable repositories:",
         values=choices + [("back", "< Back to Org/User Menu>")],
@@ -143,20 +216,20 @@ class ConfigUi:
         cancel_text="Back"
       ).run()
       if result is None or "back" in result:
+        self._flush()
         logging.info("Returning to Org/User menu.")
         return
-      self.config['enabled_repos'] = [
-        r for r in self.config['enabled_repos']
-        if r['org'] != orgOrUser
-      ]
-      for repo in result:
-        if repo != "back":
-          self.config['enabled_repos'].append({'org': orgOrUser, 'repo_name': repo})
-          logging.info(f"Enabled repo {repo} for {orgOrUser}")
-      self.saveConfig()
-      enabledSet = {(r['org'], r['repo_name']) for r in self.config['enabled_repos']}
+      selected = set(result)
+      for repo in selected - self._enabledRepos[orgOrUser]:
+        logging.info(f"Enabled repo {repo} for {orgOrUser}")
+      self._enabledRepos[orgOrUser] = selected
+      self._dirty = True
 
 
 if __name__ == '__main__':
-  ui = ConfigUi()
+  logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+  parser = argparse.ArgumentParser(description="Configure repositories enabled for Copilot.")
+  parser.add_argument('--no-cache', action='store_true', help="Always query GitHub via gh.")
+  args = parser.parse_args()
+  ui = ConfigUi(useCache=not args.no_cache)
   ui.run()
\ No newline at end of file
@@ -1,18 +1,164 @@
+import functools
 import subprocess
 import json
+import os
+import threading
+import time
 
 import logging
 
-from typing import List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Any, Callable, Dict, Tuple
+
+try:
+  import requests
+except ImportError:
+  requests = None
+
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_API_TIMEOUT = 30
+GH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "copilot_gh.json")
+GH_CACHE_TTL = 300
+GH_FALLBACK_WORKERS = 8
+REPOS_BULK_FIELDS = (
+  "repositories(first: 100, ownerAffiliations: OWNER) { nodes { name } pageInfo { hasNextPage } }"
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _gh_auth_token() -> Optional[str]:
+  """Return the token gh is logged in with, or None; gh is asked once per process.
+
+  Returns:
+      str: The token, or None if gh is missing or not logged in.
+  """
+  try:
+    result = subprocess.run(["gh", "auth", "token"], capture_output=True, text=True)
+  except FileNotFoundError as e:
+    logging.warning("Could not get a token from gh, falling back to gh CLI: %s", e)
+    return None
+  if result.returncode:
+    logging.warning("Could not get a token from gh: %s", result.stderr.strip())
+    return None
+  return result.stdout.strip()
+
+
+class _CachedGh:
+  """Small on-disk JSON cache, with an in-memory memo, for gh CLI responses."""
+
+  def __init__(self, path: str = GH_CACHE_PATH, enabled: bool = True) -> None:
+    """Initialize the cache.
+
+    Args:
+        path (str): Path of the JSON cache file.
+        enabled (bool): If False, every lookup calls the producer and nothing is stored.
+    """
+    self.path = path
+    self.enabled = enabled
+    self._lock = threading.Lock()
+    self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+  def _load(self) -> Dict[str, Dict[str, Any]]:
+    """Return the cache entries, reading the cache file on first use."""
+    if self._entries is None:
+      try:
+        with open(self.path, 'r') as f:
+          self._entries = json.load(f)
+      except (OSError, ValueError):
+        self._entries = {}
+    return self._entries
+
+  def _save(self) -> None:
+    """Write the cache entries back to disk."""
+    try:
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+      with open(self.path, 'w') as f:
+        f.write(json.dumps(self._entries, separators=(',', ':')))
+    except OSError as e:
+      logging.warning("Could not write gh cache %s: %s", self.path, e)
+
+  def peek(self, key: str, ttl: float) -> Any:
+    """Return the cached value for key, or None if it is missing or older than ttl.
+
+    Args:
+        key (str): Cache key, e.g. "repos:<owner>".
+        ttl (float): Maximum age of a cached value in seconds.
+
+    Returns:
+        Any: The cached value or None.
+    """
+    if not self.enabled:
+      return None
+    with self._lock:
+      entry = self._load().get(key)
+    if entry is not None and time.time() - entry["t"] < ttl:
+      logging.debug("gh cache hit: %s", key)
+      return entry["v"]
+    return None
+
+  def put(self, key: str, value: Any) -> None:
+    """Store value under key, unless caching is disabled or value is None.
+
+    Args:
+        key (str): Cache key.
+        value (Any): JSON-serializable value.
+    """
+    if self.enabled and value is not None:
+      with self._lock:
+        self._load()[key] = {"t": time.time(), "v": value}
+        self._save()
+
+  def get(self, key: str, ttl: float, producer: Callable[[], Any]) -> Any:
+    """Return the cached value for key, calling producer if missing or expired.
+
+    A producer result of None is treated as a failure and is not cached.
+
+    Args:
+        key (str): Cache key, e.g. "repos:<owner>".
+        ttl (float): Maximum age of a cached value in seconds.
+        producer (callable): Function computing the value on a cache miss.
+
+    Returns:
+        Any: The cached or freshly produced value.
+    """
+    value = self.peek(key, ttl)
+    if value is None:
+      value = producer()
+      self.put(key, value)
+    return value
+
+  def invalidate(self) -> None:
+    """Drop all cached entries, in memory and on disk."""
+    with self._lock:
+      self._entries = {}
+      try:
+        os.remove(self.path)
+      except FileNotFoundError:
+        pass
 
 
 class GitHubManager:
-  """Manager for GitHub user, org, and repository information using the gh CLI."""
+  """Manager for GitHub user, org, and repository information using the gh CLI.
+
+  When the optional requests package is installed, queries go straight to the GitHub
+  REST API over one keep-alive session authenticated with the gh token, instead of
+  spawning a gh process per call.
+  """
+
+  def __init__(self, use_cache: bool = True) -> None:
+    """Initialize GitHubManager and get authenticated username.
 
-  def __init__(self) -> None:
-    """Initialize GitHubManager and get authenticated username."""
+    Args:
+        use_cache (bool): Cache gh responses for GH_CACHE_TTL seconds.
+    """
+    self._cache = _CachedGh(enabled=use_cache)
+    self._session: Optional[Any] = None
+    self._session_checked = False
+    self._session_lock = threading.Lock()
+    self._etags: Dict[str, Tuple[str, Any, Optional[str]]] = {}
     self.username: Optional[str] = self.get_authenticated_username()
-    logging.info(f"Authenticated as GitHub user: {self.username}")
+    logging.info("Authenticated as GitHub user: %s", self.username)
 
   def _run_gh_command(self, args: List[str]) -> Any:
     """Run a GitHub CLI command and return parsed JSON output.
@@ -24,32 +170,107 @@ class GitHubManager:
         Any: Parsed JSON output or empty list on failure.
     """
     cmd = ["gh"] + args + ["--json", "name,login"]
-    logging.info(f"Running command: {' '.join(cmd)}")
+    logging.info("Running command: %s", cmd)
     try:
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+      result = subprocess.run(cmd, capture_output=True, text=True)
+      if result.returncode:
+        logging.error("Command failed: %s", cmd)
+        logging.error("Error output: %s", result.stderr.strip())
+        return []
       return json.loads(result.stdout)
-    except subprocess.CalledProcessError as e:
-      logging.error(f"Command failed: {' '.join(cmd)}")
-      logging.error(f"Error output: {e.stderr.strip()}")
-      return []
     except Exception as ex:
-      logging.error(f"Unexpected error running gh: {ex}")
+      logging.error("Unexpected error running gh: %s", ex)
       return []
 
+  def _get_session(self) -> Optional[Any]:
+    """Return the shared API session, creating it on first use.
+
+    Returns:
+        requests.Session: Authenticated session, or None if requests or a token is missing.
+    """
+    with self._session_lock:
+      if not self._session_checked:
+        self._session_checked = True
+        token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+        if requests is not None and not token:
+          token = _gh_auth_token()
+        if requests is not None and token:
+          self._session = requests.Session()
+          self._session.headers["Authorization"] = f"token {token}"
+          self._session.headers["Accept"] = "application/vnd.github+json"
+      return self._session
+
+  def _api_get(self, path: str) -> Any:
+    """GET a GitHub REST API endpoint, following pagination.
+
+    The ETag of every page is remembered and sent back as If-None-Match, so an
+    unchanged resource costs a 304 instead of a full response.
+
+    Args:
+        path (str): Endpoint path relative to the API root, e.g. "user/orgs".
+
+    Returns:
+        Any: Decoded JSON (list pages are concatenated), or None on failure, in which
+            case callers fall back to the gh CLI.
+    """
+    session = self._get_session()
+    url: Optional[str] = f"{GITHUB_API_URL}/{path}"
+    pages: List[Any] = []
+    while url:
+      cached = self._etags.get(url)
+      headers = {"If-None-Match": cached[0]} if cached else {}
+      logging.info("GET %s", url)
+      try:
+        resp = session.get(url, headers=headers, timeout=GITHUB_API_TIMEOUT)
+      except requests.RequestException as e:
+        logging.error("Request to %s failed: %s", url, e)
+        return None
+      if resp.status_code == 304 and cached:
+        body, next_url = cached[1], cached[2]
+      elif resp.ok:
+        try:
+          body = resp.json()
+        except ValueError as e:
+          # e.g. an HTML page from a proxy or captive portal
+          logging.warning("Response from %s is not JSON: %s", url, e)
+          return None
+        next_url = resp.links.get("next", {}).get("url")
+        if "ETag" in resp.headers:
+          self._etags[url] = (resp.headers["ETag"], body, next_url)
+      else:
+        logging.warning("Request to %s failed with HTTP %s", url, resp.status_code)
+        return None
+      if not isinstance(body, list):
+        return body
+      pages.extend(body)
+      url = next_url
+    return pages
+
+  def invalidate_cache(self) -> None:
+    """Forget all cached gh responses."""
+    self._cache.invalidate()
+
   def get_authenticated_username(self) -> Optional[str]:
     """Return the username of the authenticated user.
 
     Returns:
         str: Authenticated username, or None if not found.
     """
+    return self._cache.get("user", GH_CACHE_TTL, self._fetch_authenticated_username)
+
+  def _fetch_authenticated_username(self) -> Optional[str]:
+    """Query GitHub for the authenticated username."""
+    if self._get_session() is not None:
+      user = self._api_get("user")
+      if user is not None:
+        return user.get("login")
     cmd = ["gh", "api", "user", "--jq", ".login"]
-    logging.info(f"Retrieving authenticated username via: {' '.join(cmd)}")
-    try:
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-      return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-      logging.error(f"Failed to get authenticated username: {e.stderr.strip()}")
+    logging.info("Retrieving authenticated username via: %s", cmd)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode:
+      logging.error("Failed to get authenticated username: %s", result.stderr.strip())
       return None
+    return result.stdout.strip()
 
   def get_user_organizations(self) -> List[str]:
     """Return a list of organization logins the user belongs to.
@@ -57,21 +278,28 @@ class GitHubManager:
     Returns:
         list: Organization logins.
     """
+    orgs = self._cache.get(f"orgs:{self.username}", GH_CACHE_TTL, self._fetch_user_organizations)
+    return orgs if orgs is not None else []
+
+  def _fetch_user_organizations(self) -> Optional[List[str]]:
+    """Query GitHub for the organizations of the authenticated user."""
+    if self._get_session() is not None:
+      orgs = self._api_get("user/orgs?per_page=100")
+      if orgs is not None:
+        return [o["login"] for o in orgs]
     cmd = ["gh", "api", "user/orgs", "--jq", ".[].login"]
-    logging.info(f"Retrieving user organizations via: {' '.join(cmd)}")
-    try:
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-      orgs = result.stdout.strip().split('\n')
-      orgs = [org for org in orgs if org]
-      return orgs
-    except subprocess.CalledProcessError as e:
-      logging.error(f"Failed to get organizations: {e.stderr.strip()}")
-      return []
+    logging.info("Retrieving user organizations via: %s", cmd)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode:
+      logging.error("Failed to get organizations: %s", result.stderr.strip())
+      return None
+    return [org for org in result.stdout.splitlines() if org]
 
   def get_repos(self, org_or_user: str) -> List[str]:
     """Return a list of repository names for the given org or user.
 
-    Tries org repos first, falls back to user repos if org fails.
+    The authenticated user's own repos are read from the user endpoint directly;
+    any other owner is treated as an organization.
 
     Args:
         org_or_user (str): Organization or user.
@@ -79,30 +307,124 @@ class GitHubManager:
     Returns:
         list: Repository names.
     """
-    cmd = ["gh", "repo", "list", f"{org_or_user}", "--limit", "1000", "--json", "name"]
-    logging.info(f"Retrieving repositories for '{org_or_user}' via: {' '.join(cmd)}")
-    try:
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-      repo_objs = json.loads(result.stdout)
-      repos = [repo['name'] for repo in repo_objs if 'name' in repo]
+    repos = self._cache.get(
+      f"repos:{org_or_user}", GH_CACHE_TTL, lambda: self._fetch_repos(org_or_user)
+    )
+    return repos if repos is not None else []
+
+  def _fetch_repos(self, org_or_user: str) -> Optional[List[str]]:
+    """Query GitHub for the repository names of an org or user.
+
+    Owners other than the authenticated user are tried as an org first and, if that
+    fails (e.g. a 404 because the owner is a user), as a user.
+    """
+    if org_or_user == self.username:
+      paths = ["user/repos?affiliation=owner&per_page=100"]
+    else:
+      paths = [f"orgs/{org_or_user}/repos?per_page=100", f"users/{org_or_user}/repos?per_page=100"]
+    if self._get_session() is not None:
+      for path in paths:
+        repos = self._api_get(path)
+        if repos is not None:
+          return [repo["name"] for repo in repos]
+    for path in paths:
+      names = self._stream_gh_lines(["gh", "api", "--paginate", path, "--jq", ".[].name"])
+      if names is not None:
+        return names
+    return None
+
+  def get_repos_bulk(self, owners: List[str]) -> Dict[str, List[str]]:
+    """Return repository names for several orgs/users using a single GraphQL query.
+
+    Owners already in the cache are not queried. Owners with more than 100 repositories,
+    or that the query could not resolve, fall back to get_repos, concurrently.
+
+    Args:
+        owners (list): Organization or user names.
+
+    Returns:
+        dict: Repository names keyed by owner.
+    """
+    repos: Dict[str, List[str]] = {}
+    missing: List[str] = []
+    for owner in owners:
+      cached = self._cache.peek(f"repos:{owner}", GH_CACHE_TTL)
+      if cached is not None:
+        repos[owner] = cached
+      else:
+        missing.append(owner)
+    if not missing:
       return repos
-    except subprocess.CalledProcessError as e:
-      logging.warning(f"Failed to get repos for org '{org_or_user}': {e.stderr.strip()}")
-      if org_or_user == self.username:
-        cmd = ["gh", "repo", "list", "--limit", "1000", "--json", "name"]
-        try:
-          result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-          repo_objs = json.loads(result.stdout)
-          repos = [repo['name'] for repo in repo_objs if 'name' in repo]
-          return repos
-        except Exception as ex:
-          logging.error(f"Failed to get user repos: {ex}")
-          return []
+    query = "query { " + " ".join(
+      f"o{i}: repositoryOwner(login: {json.dumps(owner)}) {{ {REPOS_BULK_FIELDS} }}"
+      for i, owner in enumerate(missing)
+    ) + " }"
+    data = self._graphql(query) or {}
+    fallback: List[str] = []
+    for i, owner in enumerate(missing):
+      node = data.get(f"o{i}")
+      if not node or node["repositories"]["pageInfo"]["hasNextPage"]:
+        fallback.append(owner)
+        continue
+      repos[owner] = [repo["name"] for repo in node["repositories"]["nodes"]]
+      self._cache.put(f"repos:{owner}", repos[owner])
+    if fallback:
+      with ThreadPoolExecutor(max_workers=GH_FALLBACK_WORKERS) as executor:
+        repos.update(zip(fallback, executor.map(self.get_repos, fallback)))
+    return repos
+
+  def _graphql(self, query: str) -> Optional[Dict[str, Any]]:
+    """Run a GraphQL query and return its data object.
+
+    Partial results are returned even when some fields failed to resolve.
+
+    Args:
+        query (str): GraphQL query document.
+
+    Returns:
+        dict: The "data" member of the response, or None on failure.
+    """
+    session = self._get_session()
+    try:
+      if session is not None:
+        logging.info("POST %s/graphql", GITHUB_API_URL)
+        body = session.post(
+          f"{GITHUB_API_URL}/graphql", json={"query": query}, timeout=GITHUB_API_TIMEOUT
+        ).json()
       else:
-        return []
+        cmd = ["gh", "api", "graphql", "-F", "query=@-"]
+        logging.info("Running command: %s", cmd)
+        result = subprocess.run(cmd, input=query, capture_output=True, text=True)
+        body = json.loads(result.stdout)
     except Exception as ex:
-      logging.error(f"Unexpected error running gh: {ex}")
-      return []
+      logging.error("GraphQL query failed: %s", ex)
+      return None
+    for error in body.get("errors", []):
+      logging.warning("GraphQL error: %s", error.get('message'))
+    return body.get("data")
+
+  def _stream_gh_lines(self, cmd: List[str]) -> Optional[List[str]]:
+    """Run a gh command and collect its non-empty stdout lines as they are produced.
+
+    Args:
+        cmd (list): Full gh command line.
+
+    Returns:
+        list: Output lines, or None if the command failed.
+    """
+    logging.info("Running command: %s", cmd)
+    try:
+      proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+      logging.error("Unexpected error running gh: %s", e)
+      return None
+    with proc:
+      lines = [line.rstrip("\n") for line in proc.stdout if line.strip()]
+      stderr = proc.stderr.read()
+    if proc.returncode != 0:
+      logging.warning("Command failed: %s: %s", cmd, stderr.strip())
+      return None
+    return lines
 
   @property
   def user(self) -> Optional[str]:
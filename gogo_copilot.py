@@ -1,52 +1,87 @@
 import logging
 import os
+import re
 import subprocess
-from typing import Optional
+import tempfile
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
 
 from git import Repo, GitCommandError
 
+from gogo_gadget import read_fenced_json
+from gogo_git import GoGoGit, clear_cli_cache, get_gh_path
 from gogo_structuredproposalresponse import StructuredProposalResponse, StructuredProposalResponseError
 
+# "+++ b/<path>" headers of a unified diff, for str and bytes patches
+_PATCH_TARGET_RE = re.compile(r"^\+\+\+ b/([^\r\n]+)", re.MULTILINE)
+_PATCH_TARGET_RE_BYTES = re.compile(rb"^\+\+\+ b/([^\r\n]+)", re.MULTILINE)
+
+# Paths per git add invocation, keeping command lines well under ARG_MAX
+GIT_ADD_BATCH_SIZE = 500
+
 class GoGoCopilotError(Exception):
     pass
 
 class GoGoCopilot:
+    # Prompt file contents by absolute path, with the mtime they were read at
+    _PROMPT_CACHE: Dict[str, Tuple[int, str]] = {}
+
     def __init__(self, preamble_path="prompts/preamble.md", postamble_path="prompts/postamble.md", repo_path: Optional[str] = None):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.info("Initializing GoGoCopilot instance.")
         self._check_gh_and_copilot()
         self.preamble = self._load_file(preamble_path)
         self.postamble = self._load_file(postamble_path)
+        self._update_prompt_affixes()
+        # The last patch _parse_patch_files scanned, and the paths it found in it
+        self._parsed_patch: Optional[Tuple[Union[str, bytes], FrozenSet[str]]] = None
         self.repo_path = repo_path or os.getcwd()
         try:
             self.repo = Repo(self.repo_path)
         except Exception as e:
-            self.logger.error(f"Could not initialize git repo at {self.repo_path}: {e}")
+            self.logger.error("Could not initialize git repo at %s: %s", self.repo_path, e)
             self.repo = None
+        # Looked up once; each repo.working_tree_dir access goes through GitPython properties
+        self._working_tree_dir = self.repo.working_tree_dir if self.repo else None
 
     def _check_gh_and_copilot(self):
         self.logger.debug("Checking for gh CLI installation.")
-        result = subprocess.run(["gh", "--version"], capture_output=True)
-        if result.returncode != 0:
+        if not GoGoGit.is_gh_installed():
             self.logger.error("gh CLI not found.")
             raise GoGoCopilotError("gh CLI is not installed.")
         self.logger.info("gh CLI is installed.")
         self.logger.debug("Checking for gh copilot extension.")
-        result = subprocess.run(["gh", "extension", "list"], capture_output=True, text=True)
-        if "copilot" not in result.stdout:
+        if not GoGoGit.is_gh_copilot_installed():
             self.logger.error("gh copilot extension not installed.")
             raise GoGoCopilotError("gh copilot extension is not installed.")
         self.logger.info("gh copilot extension is installed.")
 
+    @staticmethod
+    def invalidate_env_cache():
+        """Forget the cached gh / copilot extension checks, e.g. after installing them."""
+        clear_cli_cache()
+
     def _load_file(self, path):
-        self.logger.debug(f"Loading file at path: {path}")
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                content = f.read()
-            self.logger.info(f"Loaded file: {path}")
-            return content
-        self.logger.warning(f"File not found: {path}. Using empty string.")
-        return ""
+        self.logger.debug("Loading file at path: %s", path)
+        key = os.path.abspath(path)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except FileNotFoundError:
+            self.logger.warning("File not found: %s. Using empty string.", path)
+            return ""
+        cached = self._PROMPT_CACHE.get(key)
+        if cached is not None and cached[0] == mtime:
+            self.logger.debug("Using cached contents of %s", path)
+            return cached[1]
+        with open(key, "r") as f:
+            content = f.read()
+        self._PROMPT_CACHE[key] = (mtime, content)
+        self.logger.info("Loaded file: %s", path)
+        return content
+
+    def _update_prompt_affixes(self):
+        # The parts of the prompt around the issue reference, joined once per preamble/postamble
+        self._prompt_prefix = f"{self.preamble}\nPlease solve "
+        self._prompt_suffix = f"\n{self.postamble}"
 
     def get_preamble(self):
         self.logger.debug("Getting preamble string.")
@@ -55,6 +90,7 @@ class GoGoCopilot:
     def set_preamble(self, text):
         self.logger.info("Setting new preamble string.")
         self.preamble = text
+        self._update_prompt_affixes()
 
     def get_postamble(self):
         self.logger.debug("Getting postamble string.")
@@ -63,45 +99,73 @@ class GoGoCopilot:
     def set_postamble(self, text):
         self.logger.info("Setting new postamble string.")
         self.postamble = text
+        self._update_prompt_affixes()
 
     def suggest_solution(self, org, repo, issue_num):
-        prompt = f"{self.preamble}\nPlease solve {org}/{repo}/issue/{issue_num}\n{self.postamble}"
-        self.logger.info(f"Invoking Copilot for solution: org={org}, repo={repo}, issue={issue_num}")
-        self.logger.debug(f"Prompt sent to Copilot:\n{prompt}")
+        prompt = f"{self._prompt_prefix}{org}/{repo}/issue/{issue_num}{self._prompt_suffix}"
+        self.logger.info("Invoking Copilot for solution: org=%s, repo=%s, issue=%s",
+                         org, repo, issue_num)
+        self.logger.debug("Prompt sent to Copilot:\n%s", prompt)
         try:
-            result = subprocess.run(
-                ["gh", "copilot", "suggest", "--prompt", prompt, "--repo", f"{org}/{repo}"],
-                capture_output=True,
-                text=True,
-            )
-            self.logger.debug(f"Copilot suggest command exit code: {result.returncode}")
-            if result.returncode != 0:
-                self.logger.error(f"Copilot suggest failed: {result.stderr}")
+            # stderr goes to a temporary file so it cannot fill a pipe and stall gh
+            # while stdout is read as it is produced
+            with tempfile.TemporaryFile() as errors:
+                with subprocess.Popen(
+                    [get_gh_path() or "gh", "copilot", "suggest",
+                     "--prompt", prompt, "--repo", f"{org}/{repo}"],
+                    stdout=subprocess.PIPE,
+                    stderr=errors,
+                ) as proc:
+                    output = read_fenced_json(proc.stdout)
+                    # Let gh finish writing whatever follows the JSON block
+                    proc.stdout.read()
+                errors.seek(0)
+                stderr = errors.read().decode("utf-8", "replace")
+            self.logger.debug("Copilot suggest command exit code: %s", proc.returncode)
+            if proc.returncode != 0:
+                self.logger.error("Copilot suggest failed: %s", stderr)
                 raise GoGoCopilotError("Failed to get Copilot suggestion.")
             self.logger.info("Copilot suggestion received successfully.")
-            # Parse result.stdout as StructuredProposalResponse (JSON)
-            return StructuredProposalResponse.from_json(result.stdout)
+            # Parse the output as StructuredProposalResponse (JSON)
+            return StructuredProposalResponse.from_json(output)
         except Exception as e:
             self.logger.exception("Error during suggest_solution")
             raise GoGoCopilotError(str(e))
 
-    def install_suggestion(self, proposal: StructuredProposalResponse):
+    def install_suggestion(self, proposal: StructuredProposalResponse, stage: bool = False):
+        """
+        Apply the proposal's patch to the working tree. With stage=True the patch is applied
+        to the index too (git apply --index), so add_proposal is not needed for its files.
+        """
         self.logger.info("Installing proposal suggestion.")
-        # Refactored to use only 'patch' field and GitPython
         try:
             if not self.repo:
                 raise GoGoCopilotError("Git repo is not initialized.")
             if not proposal.patch:
                 self.logger.error("No patch found in proposal.")
                 raise GoGoCopilotError("Proposal does not contain a patch.")
-            self.logger.debug("Applying patch from proposal using GitPython.")
-            try:
-                # GitPython's git interface allows you to pass the patch via stdin using '--whitespace=nowarn' for leniency if needed
-                self.repo.git.apply('--whitespace=nowarn', with_stdout=False, input=proposal.patch)
-                self.logger.info("Patch applied successfully using GitPython.")
-            except GitCommandError as gce:
-                self.logger.error(f"Failed to apply patch via GitPython: {gce}")
-                raise GoGoCopilotError(f"Patch application failed: {gce}")
+            patch = proposal.patch
+            if isinstance(patch, str):
+                patch = patch.encode("utf-8")
+            cmd = ["git", "apply", "--whitespace=nowarn"]
+            if stage:
+                cmd.append("--index")
+            cmd.append("-")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Applying patch from proposal: %s", " ".join(cmd))
+            # The patch is piped to git as bytes; only stderr is kept, for error reporting
+            result = subprocess.run(
+                cmd,
+                cwd=self._working_tree_dir,
+                input=patch,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            if result.returncode != 0:
+                stderr = result.stderr.decode("utf-8", "replace").strip()
+                self.logger.error("Failed to apply patch: %s", stderr)
+                raise GoGoCopilotError(f"Patch application failed: {stderr}")
+            self.logger.info("Patch applied successfully.")
         except Exception as e:
             self.logger.exception("Error in install_suggestion")
             raise GoGoCopilotError(str(e))
@@ -122,29 +186,22 @@ class GoGoCopilot:
             changed_files = self._parse_patch_files(srp.patch)
             if not changed_files:
                 self.logger.warning("No changed files detected in patch.")
-            for path in changed_files:
-                self.logger.debug(f"Staging file: {path}")
-                try:
-                    self.repo.git.add(path)
-                except GitCommandError as gce:
-                    self.logger.error(f"Failed to add {path}: {gce}")
-                    raise GoGoCopilotError(f"Failed to stage {path}: {gce}")
-
-            # Always check for conversation.GoGoCopilot.md and stage if present
+            to_add = sorted(changed_files)
+            self.logger.debug("Staging files: %s", to_add)
+
+            # Always check for conversation.GoGoCopilot.md and stage it along with the patch files.
+            # git add has no option to skip a missing path, so the stat stays
             conv_file = "conversation.GoGoCopilot.md"
-            conv_path = os.path.join(self.repo.working_tree_dir, conv_file)
-            if os.path.exists(conv_path):
-                try:
-                    self.logger.info(f"Staging {conv_file}.")
-                    self.repo.git.add(conv_file)
-                except GitCommandError as gce:
-                    self.logger.error(f"Failed to add {conv_file}: {gce}")
-                    raise GoGoCopilotError(f"Failed to stage {conv_file}: {gce}")
+            conv_path = os.path.join(self._working_tree_dir, conv_file)
+            if os.path.exists(conv_path) and conv_file not in changed_files:
+                self.logger.info("Staging %s.", conv_file)
+                to_add.append(conv_file)
+            self._git_add(to_add)
 
             if interactive:
                 unstaged = [item.a_path for item in self.repo.index.diff(None)]
                 if unstaged:
-                    self.logger.info(f"Unstaged files detected: {unstaged}")
+                    self.logger.info("Unstaged files detected: %s", unstaged)
                     print("Unstaged files detected:")
                     for idx, fname in enumerate(unstaged, 1):
                         print(f"{idx}: {fname}")
@@ -160,19 +217,25 @@ class GoGoCopilot:
                             indices = [int(i) for i in ans.split(",") if i.strip().isdigit()]
                             to_stage = [unstaged[i - 1] for i in indices if 0 < i <= len(unstaged)]
                         except Exception as e:
-                            self.logger.error(f"Error parsing selection: {e}")
+                            self.logger.error("Error parsing selection: %s", e)
                             raise GoGoCopilotError("Invalid selection for staging files.")
+                    self._git_add(to_stage)
                     for path in to_stage:
-                        try:
-                            self.repo.git.add(path)
-                            self.logger.info(f"Staged unstaged file: {path}")
-                        except GitCommandError as gce:
-                            self.logger.error(f"Failed to add {path}: {gce}")
-                            raise GoGoCopilotError(f"Failed to stage {path}: {gce}")
+                        self.logger.info("Staged unstaged file: %s", path)
         except Exception as e:
             self.logger.exception("Error in add_proposal")
             raise GoGoCopilotError(str(e))
 
+    def _git_add(self, paths: List[str]):
+        """Stage paths with as few git add invocations as possible."""
+        for start in range(0, len(paths), GIT_ADD_BATCH_SIZE):
+            batch = paths[start:start + GIT_ADD_BATCH_SIZE]
+            try:
+                self.repo.git.add("--", *batch)
+            except GitCommandError as gce:
+                self.logger.error("Failed to add %s files: %s", len(batch), gce)
+                raise GoGoCopilotError(f"Failed to stage files: {gce}")
+
     def commit_proposal(self, srp: StructuredProposalResponse):
         """
         Commit the staged files with the commit message from srp.message.
@@ -185,20 +248,24 @@ class GoGoCopilot:
             raise GoGoCopilotError("Proposal does not contain a commit message.")
         try:
             commit = self.repo.index.commit(srp.message)
-            self.logger.info(f"Committed with: {commit.hexsha}")
+            self.logger.info("Committed with: %s", commit.hexsha)
         except Exception as e:
-            self.logger.error(f"Failed to commit: {e}")
+            self.logger.error("Failed to commit: %s", e)
             raise GoGoCopilotError(f"Failed to commit: {e}")
 
-    def _parse_patch_files(self, patch: str):
+    def _parse_patch_files(self, patch: Union[str, bytes]) -> FrozenSet[str]:
         """
-        Parse a unified diff patch and return a set of changed file paths.
+        Parse a unified diff patch (str or bytes) and return a set of changed file paths.
+        The result for the most recent patch object is remembered, so retries do not rescan it.
         """
-        files = set()
-        for line in patch.splitlines():
-            if line.startswith('+++ b/'):
-                path = line[6:]
-                if path != '/dev/null':
-                    files.add(path)
-        self.logger.debug(f"Files parsed from patch: {files}")
-        return files
\ No newline at end of file
+        if self._parsed_patch is not None and self._parsed_patch[0] is patch:
+            return self._parsed_patch[1]
+        if isinstance(patch, bytes):
+            files = {m.decode("utf-8", "surrogateescape")
+                     for m in _PATCH_TARGET_RE_BYTES.findall(patch)}
+        else:
+            files = set(_PATCH_TARGET_RE.findall(patch))
+        files.discard('/dev/null')
+        self.logger.debug("Files parsed from patch: %s", files)
+        self._parsed_patch = (patch, frozenset(files))
+        return self._parsed_patch[1]
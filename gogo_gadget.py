@@ -1,77 +1,184 @@
 import subprocess
 import logging
 import shutil
-import re
 import os
 import json
-from typing import Dict, Optional, Any
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Any
 
 # Corrected import: use underscores, not hyphens, in module names
-from gogo_git import GoGoGit, GoGoGitError
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+from gogo_git import GoGoGit, GoGoGitError, get_gh_path
+
+SUGGEST_PROMPT_TEMPLATE = (
+    "Please review the issue at @%(repo)s/issue/%(issue)s including all of the comments. "
+    "Examine the contents of branch copilot-proposed-fixes-for-issue-%(issue)s of the repo at %(repo)s if it exists, "
+    "and use it as a basis for a proposed or modified solution to the issue. "
+    "The proposed solution should include an EXPLANATION of the approach and any files needed to implement the proposed solution."
+)
+
+def read_fenced_json(lines: Iterable[bytes]) -> str:
+    """
+    Read raw Copilot output line by line as it is produced, stopping at the end of the
+    first ```json block and returning just that block. As with a search for
+    ```json(.*?)```, the fences may sit anywhere on a line (indented, or both on one
+    line). Prose before the block is logged and dropped. Without a fenced block, the
+    output from its first "{" to its last "}" is returned, or all of it if there is no
+    such pair. The kept bytes are decoded once, at the end.
+    """
+    buffered: List[bytes] = []
+    in_block = False
+    for line in lines:
+        if not in_block:
+            start = line.find(b"```json")
+            if start < 0:
+                buffered.append(line)
+                continue
+            buffered.append(line[:start])
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Copilot explanation: %s",
+                              b"".join(buffered).decode("utf-8", "replace").strip())
+            buffered = []
+            in_block = True
+            line = line[start + len(b"```json"):]
+        end = line.find(b"```")
+        if end >= 0:
+            buffered.append(line[:end])
+            break
+        buffered.append(line)
+    output = b"".join(buffered)
+    if not in_block:
+        first, last = output.find(b"{"), output.rfind(b"}")
+        if 0 <= first < last:
+            output = output[first:last + 1]
+    return output.decode("utf-8", "replace")
 
 class GoGoGadgetError(Exception):
     pass
 
 class GoGoGadget:
+    # Prompt file contents by absolute path, with the mtime they were read at
+    _PROMPT_CACHE: Dict[str, Tuple[int, str]] = {}
+
     def __init__(self):
         # Instance variables for consistent prompts
-        self.preamble_prompt = self._read_prompt_file("preamble.prompt")
-        self.preamble = self._read_prompt_file("prompts/preamble.md")
-        self.postamble = self._read_prompt_file("prompts/postamble.md")
-
-    @staticmethod
-    def _read_prompt_file(filepath: str) -> str:
-        """Read the contents of a prompt file, return empty string if file does not exist."""
+        self._preamble_prompt = self._read_prompt_file("preamble.prompt")
+        self._preamble = self._read_prompt_file("prompts/preamble.md")
+        self._postamble = self._read_prompt_file("prompts/postamble.md")
+        self._update_prompt_affixes()
+        self.refresh_env()
+
+    def _update_prompt_affixes(self) -> None:
+        # The composed parts that do not depend on the user prompt, joined once per change
+        self._prompt_prefix = f"{self._preamble_prompt}{self._preamble}\n"
+        self._prompt_suffix = f"\n{self._postamble}"
+
+    @property
+    def preamble_prompt(self) -> str:
+        return self._preamble_prompt
+
+    @preamble_prompt.setter
+    def preamble_prompt(self, text: str) -> None:
+        self._preamble_prompt = text
+        self._update_prompt_affixes()
+
+    @property
+    def preamble(self) -> str:
+        return self._preamble
+
+    @preamble.setter
+    def preamble(self, text: str) -> None:
+        self._preamble = text
+        self._update_prompt_affixes()
+
+    @property
+    def postamble(self) -> str:
+        return self._postamble
+
+    @postamble.setter
+    def postamble(self, text: str) -> None:
+        self._postamble = text
+        self._update_prompt_affixes()
+
+    def refresh_env(self) -> None:
+        """Rebuild the environment gh copilot runs with from the current os.environ.
+        Only needed if the process environment changed since this instance was created."""
+        self._copilot_env = {
+            **os.environ,
+            "GH_COPILOT_NO_USAGE_STATS_PROMPT": "1",
+            "GH_COPILOT_INTERACTIVE": "false",
+        }
+
+    @classmethod
+    def _read_prompt_file(cls, filepath: str) -> str:
+        """Read the contents of a prompt file, return empty string if file does not exist.
+        Contents are cached and only read again once the file's mtime changes."""
+        key = os.path.abspath(filepath)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except FileNotFoundError:
+            return ""
+        cached = cls._PROMPT_CACHE.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return f.read()
+            with open(key, "r", encoding="utf-8") as f:
+                content = f.read()
         except FileNotFoundError:
             return ""
+        cls._PROMPT_CACHE[key] = (mtime, content)
+        return content
 
     def _compose_prompt(self, user_prompt: str) -> str:
         """Compose the full prompt with preamble and postamble."""
-        return f"{self.preamble_prompt}{self.preamble}\n{user_prompt}\n{self.postamble}"
+        return self._prompt_prefix + user_prompt + self._prompt_suffix
 
     def suggest_solution(self, org: str, repo_name: str, issue_num: int) -> Dict[str, object]:
         """
         Requests a Copilot suggestion for a GitHub issue, fully non-interactive.
         """
-        user_prompt = (
-            f"Please review the issue at @{org}/{repo_name}/issue/{issue_num} including all of the comments. "
-            f"Examine the contents of branch copilot-proposed-fixes-for-issue-{issue_num} of the repo at {org}/{repo_name} if it exists, "
-            "and use it as a basis for a proposed or modified solution to the issue. "
-            "The proposed solution should include an EXPLANATION of the approach and any files needed to implement the proposed solution."
-        )
+        user_prompt = SUGGEST_PROMPT_TEMPLATE % {"repo": f"{org}/{repo_name}", "issue": issue_num}
         prompt = self._compose_prompt(user_prompt)
-        logging.info(f"Requesting solution from Copilot for {org}/{repo_name} issue #{issue_num}")
-
-        env = os.environ.copy()
-        env["GH_COPILOT_NO_USAGE_STATS_PROMPT"] = "1"
-        env["GH_COPILOT_INTERACTIVE"] = "false"
+        logging.info("Requesting solution from Copilot for %s/%s issue #%s",
+                     org, repo_name, issue_num)
 
         command = [
-            "gh", "copilot", "suggest",
+            get_gh_path() or "gh", "copilot", "suggest",
             "--type", "code",
             "--no-interactive",
         ]
 
-        try:
-            # Use DEVNULL for stdin so it cannot prompt even if it tries
-            result = subprocess.check_output(
-                command,
-                input=prompt,
-                text=True,
-                stderr=subprocess.STDOUT,
-                env=env,
-                stdin=subprocess.DEVNULL,
+        # stderr goes to a temporary file, not a pipe, so it can neither mix with the
+        # structured response nor fill up and block gh while stdout is being read
+        with tempfile.TemporaryFile() as errors:
+            try:
+                # The prompt is written to stdin, which is then closed so gh cannot prompt
+                proc = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=errors,
+                    env=self._copilot_env,
+                )
+            except OSError as e:
+                raise GoGoGadgetError(f"Failed to get solution from Copilot: {e}")
+            with proc:
+                try:
+                    proc.stdin.write(prompt.encode("utf-8"))
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+                suggestion = read_fenced_json(proc.stdout)
+                proc.stdout.read()
+            errors.seek(0)
+            stderr = errors.read().decode("utf-8", "replace").strip()
+        if stderr:
+            logging.debug("gh copilot stderr: %s", stderr)
+        if proc.returncode != 0:
+            raise GoGoGadgetError(
+                f"Failed to get solution from Copilot: {stderr or suggestion.strip()}"
             )
-            return self.process_structured_response(result)
-        except subprocess.CalledProcessError as e:
-            raise GoGoGadgetError(f"Failed to get solution from Copilot: {e.output.strip()}")
-        except Exception as e:
-            raise GoGoGadgetError(f"Failed to get solution from Copilot: {e}")
+        return self.process_structured_response(suggestion)
 
     def process_structured_response(self, suggestion: str) -> Dict[str, Any]:
         """
@@ -80,19 +187,22 @@ class GoGoGadget:
         """
         try:
             # Try to extract JSON from code blocks if necessary
-            match = re.search(r"```json(?P<json>.*?)```", suggestion, re.DOTALL)
-            if match:
-                json_str = match.group("json")
-            else:
-                # Fallback: try to parse the whole string
-                json_str = suggestion
+            # A forward scan for the first ```json ... ``` block, as plain substring finds
+            json_str = suggestion
+            start = suggestion.find("```json")
+            if start >= 0:
+                start += len("```json")
+                end = suggestion.find("```", start)
+                if end >= 0:
+                    json_str = suggestion[start:end]
+            # Otherwise fall back to parsing the whole string
 
             # Remove possible leading/trailing whitespace
             json_str = json_str.strip()
             response = json.loads(json_str)
             return response
         except Exception as e:
-            logging.error(f"Failed to parse structured response: {e}")
+            logging.error("Failed to parse structured response: %s", e)
             raise GoGoGadgetError(f"Failed to parse structured response: {e}")
 
     def install_suggestion(self, structured_response: Dict[str, Any], target_dir: str) -> None:
@@ -103,18 +213,34 @@ class GoGoGadget:
         if not files:
             raise GoGoGadgetError("No files found in structured response to install.")
 
-        for rel_path, content in files.items():
-            abs_path = os.path.join(target_dir, rel_path)
-            abs_dir = os.path.dirname(abs_path)
+        writes = [(os.path.join(target_dir, rel_path), content.encode("utf-8"))
+                  for rel_path, content in files.items()]
+        # Each directory once, parents before children, so every makedirs finds its
+        # parent already there and only has to create the last component
+        for abs_dir in sorted({os.path.dirname(abs_path) for abs_path, _ in writes}, key=len):
             os.makedirs(abs_dir, exist_ok=True)
-            with open(abs_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            logging.info(f"Installed file: {abs_path}")
+        # The writes are independent and release the GIL, so they can overlap
+        with ThreadPoolExecutor(max_workers=min(32, len(writes))) as pool:
+            for abs_path in pool.map(self._write_file, *zip(*writes)):
+                logging.info("Installed file: %s", abs_path)
 
         # Optionally, handle install instructions or errors
         if "install" in structured_response:
-            logging.info("Manual install instructions: " + str(structured_response["install"]))
+            logging.info("Manual install instructions: %s", structured_response["install"])
         if "errors" in structured_response:
-            logging.warning("Errors or warnings: " + str(structured_response["errors"]))
+            logging.warning("Errors or warnings: %s", structured_response["errors"])
+
+    @staticmethod
+    def _write_file(abs_path: str, data: bytes) -> str:
+        """Replace the contents of abs_path with data using raw os-level writes."""
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+        fd = os.open(abs_path, flags, 0o666)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        return abs_path
 
     # ... other methods unchanged ...
\ No newline at end of file
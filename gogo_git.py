@@ -6,127 +6,329 @@ Attribution: Generated with the help of GitHub Copilot and OpenAI's GPT models.
 An object-oriented, importable Python module for managing git repositories, executing git commands with logging, 
 and now also managing checks for gh CLI and Copilot CLI.
 """
+import atexit
+import concurrent.futures
+import functools
 import os
+import shlex
 import subprocess
 import shutil
 import logging
-from typing import List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple, Union
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+# Kept in ~/.ssh rather than the shared temp directory, where another user could plant
+# or hijack the socket
+SSH_CONTROL_PATH = os.path.join(os.path.expanduser("~"), ".ssh", "gogo-git-%C")
 
 class GoGoGitError(Exception):
     pass
 
+@functools.lru_cache(maxsize=1)
+def _ssh_control_dir_ready() -> bool:
+    """Create the directory of SSH_CONTROL_PATH, owner-only, if it is missing.
+
+    Returns False if it cannot be created, in which case connections are not shared.
+    """
+    try:
+        os.makedirs(os.path.dirname(SSH_CONTROL_PATH), mode=0o700, exist_ok=True)
+    except OSError as e:
+        logging.warning("Not sharing ssh connections, could not create %s: %s",
+                        os.path.dirname(SSH_CONTROL_PATH), e)
+        return False
+    return True
+
+@functools.lru_cache(maxsize=1)
+def get_gh_path() -> Optional[str]:
+    """Return the absolute path of the gh executable found on PATH, or None.
+
+    The PATH scan happens once per process; running gh by this path also spares
+    the exec from searching PATH again.
+    """
+    return shutil.which("gh")
+
+def clear_cli_cache() -> None:
+    """Forget the memoized git / gh / copilot / auth checks, e.g. in tests."""
+    get_gh_path.cache_clear()
+    GoGoGit.is_git_installed.cache_clear()
+    GoGoGit.is_gh_installed.cache_clear()
+    GoGoGit.is_gh_copilot_installed.cache_clear()
+    GoGoGit.is_gh_authenticated.cache_clear()
+
 class GoGoGit:
     def __init__(self, repo_path: str):
         if not self.is_git_installed():
             raise GoGoGitError("git is not installed or not found in PATH.")
         self.repo_path = repo_path
+        self._batch_proc: Optional[subprocess.Popen] = None
+        self._batch_lock = threading.Lock()
         if not os.path.exists(self.repo_path):
             os.makedirs(self.repo_path, exist_ok=True)
         if not self.is_git_repo():
-            logging.info(f"{self.repo_path} is not a git repository.")
+            logging.info("%s is not a git repository.", self.repo_path)
         else:
-            logging.info(f"Initialized GoGoGit for repository at {self.repo_path}")
+            logging.info("Initialized GoGoGit for repository at %s", self.repo_path)
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def is_git_installed() -> bool:
-        try:
-            subprocess.check_output(["git", "--version"])
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        return shutil.which("git") is not None
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def is_gh_installed() -> bool:
-        return shutil.which("gh") is not None
+        return get_gh_path() is not None
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def is_gh_copilot_installed() -> bool:
+        """Check for the gh copilot extension, looking on disk before asking gh."""
+        if os.path.isdir(os.path.join(GoGoGit._gh_data_dir(), "extensions", "gh-copilot")):
+            return True
         try:
-            output = subprocess.check_output(["gh", "extension", "list"], text=True)
+            output = subprocess.check_output(
+                [get_gh_path() or "gh", "extension", "list"], text=True
+            )
             return "copilot" in output
         except Exception:
             return False
 
     @staticmethod
+    def _gh_data_dir() -> str:
+        """Return the directory gh installs extensions under, resolved the way gh does."""
+        if os.environ.get("GH_DATA_DIR"):
+            return os.environ["GH_DATA_DIR"]
+        if os.environ.get("XDG_DATA_HOME"):
+            return os.path.join(os.environ["XDG_DATA_HOME"], "gh")
+        if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+            return os.path.join(os.environ["LOCALAPPDATA"], "GitHub CLI")
+        return os.path.join(os.path.expanduser("~"), ".local", "share", "gh")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
     def is_gh_authenticated() -> bool:
+        """Check for a valid github.com login, using the exit status of gh auth status."""
         try:
             result = subprocess.run(
-                ["gh", "auth", "status"],
+                [get_gh_path() or "gh", "auth", "status", "--hostname", "github.com"],
+                stdin=subprocess.DEVNULL,
                 capture_output=True,
                 text=True,
-                check=True,
             )
-            return "Logged in to github.com" in result.stdout
-        except subprocess.CalledProcessError:
+        except FileNotFoundError:
             return False
+        return result.returncode == 0
+
+    @staticmethod
+    def _network_env() -> Dict[str, str]:
+        """Environment for git commands that talk to a remote.
+
+        Disables credential prompts and, unless the caller already set GIT_SSH_COMMAND,
+        lets consecutive ssh connections share one ControlMaster connection.
+        """
+        env = os.environ.copy()
+        env["GIT_TERMINAL_PROMPT"] = "0"
+        if "GIT_SSH_COMMAND" not in env and _ssh_control_dir_ready():
+            env["GIT_SSH_COMMAND"] = (
+                "ssh -o ControlMaster=auto -o ControlPersist=60 "
+                f"-o ControlPath={shlex.quote(SSH_CONTROL_PATH)}"
+            )
+        return env
 
-    def _run_git(self, args: List[str], check: bool = True, capture_output: bool = False) -> subprocess.CompletedProcess:
-        logging.info(f"Running git command: git {' '.join(args)}")
+    def _run_git(self, args: List[str], check: bool = True, capture_output: bool = False,
+                 env: Optional[Dict[str, str]] = None,
+                 input: Optional[Union[str, bytes]] = None) -> subprocess.CompletedProcess:
+        """Run git with args in the repository. input, if given, is written to git's stdin;
+        bytes input switches the whole call to binary mode."""
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info("Running git command: git %s", " ".join(args))
         return subprocess.run(
             ["git"] + args,
             cwd=self.repo_path,
             check=check,
             capture_output=capture_output,
-            text=True
+            text=not isinstance(input, bytes),
+            env=env,
+            input=input,
         )
 
     def is_git_repo(self) -> bool:
+        """Check if repo_path is inside a git work tree.
+
+        A .git entry (directory, or file for worktrees and submodules) directly in
+        repo_path is detected with a single lstat; otherwise git rev-parse decides.
+        """
+        try:
+            os.lstat(os.path.join(self.repo_path, ".git"))
+            return True
+        except OSError:
+            pass
         try:
             self._run_git(["rev-parse", "--is-inside-work-tree"], capture_output=True)
             return True
         except subprocess.CalledProcessError:
             return False
 
-    def is_clean(self) -> bool:
-        """Check if the repository is clean (no uncommitted changes)."""
-        result = self._run_git(["status", "--porcelain"], capture_output=True)
+    def is_clean(self, include_untracked: bool = False) -> bool:
+        """Check if the repository is clean (no uncommitted changes).
+
+        Untracked files are only looked for when include_untracked is set, since
+        walking the untracked tree is the slow part of git status on large repos.
+        """
+        result = self._run_git(
+            ["--no-optional-locks", "status", "--porcelain=v2", "--no-ahead-behind",
+             "--untracked-files=" + ("all" if include_untracked else "no")],
+            capture_output=True,
+        )
         return result.stdout.strip() == ""
 
-    def ensure_cloned(self, org: str, repo_name: str, base_dir: str) -> str:
-        """Ensure that DIR/org/repo_name exists as a git repo, cloning if necessary."""
+    def ensure_cloned(self, org: str, repo_name: str, base_dir: str,
+                      depth: Optional[int] = None, recurse_submodules: bool = False,
+                      jobs: Optional[int] = None, single_branch: bool = False,
+                      branch: Optional[str] = None, filter_blobs: bool = False) -> str:
+        """Ensure that DIR/org/repo_name exists as a git repo, cloning if necessary.
+
+        depth makes a shallow clone; recurse_submodules also clones submodules,
+        fetching up to jobs of them in parallel. branch checks out that branch instead
+        of the remote HEAD and single_branch fetches only it. filter_blobs makes a
+        partial clone (--filter=blob:none) that downloads file contents only when
+        they are first needed. For a throwaway checkout of the tip, depth=1 with
+        single_branch and filter_blobs transfers the least.
+        """
         repo_path = os.path.join(base_dir, org, repo_name)
-        if not os.path.exists(repo_path):
-            os.makedirs(os.path.dirname(repo_path), exist_ok=True)
-            logging.info(f"Cloning repository {org}/{repo_name} into {repo_path}")
-            subprocess.check_call(
-                ["git", "clone", f"git@github.com:{org}/{repo_name}.git", repo_path]
-            )
-        elif not os.path.exists(os.path.join(repo_path, ".git")):
+        # Common case: already cloned, answered by a single stat of the .git entry
+        if os.path.lexists(os.path.join(repo_path, ".git")):
+            return repo_path
+        if os.path.exists(repo_path):
             raise GoGoGitError(f"{repo_path} exists but is not a git repository.")
+        os.makedirs(os.path.dirname(repo_path), exist_ok=True)
+        cmd = ["git", "clone"]
+        if depth:
+            cmd.append(f"--depth={depth}")
+        if single_branch:
+            cmd.append("--single-branch")
+        if branch:
+            cmd.append(f"--branch={branch}")
+        if filter_blobs:
+            cmd.append("--filter=blob:none")
+        if recurse_submodules:
+            cmd.append("--recurse-submodules")
+            if jobs:
+                cmd.append(f"--jobs={jobs}")
+        cmd += [f"git@github.com:{org}/{repo_name}.git", repo_path]
+        logging.info("Cloning repository %s/%s into %s", org, repo_name, repo_path)
+        subprocess.check_call(cmd, env=self._network_env())
         return repo_path
 
+    def ensure_cloned_many(self, specs: List[Tuple[str, str, str]], jobs: int = 8,
+                           depth: Optional[int] = None, recurse_submodules: bool = False,
+                           single_branch: bool = False,
+                           filter_blobs: bool = False) -> List[str]:
+        """Run ensure_cloned for each (org, repo_name, base_dir) in specs, up to jobs at a time.
+
+        Returns the repository paths in the order of specs. The first failed clone
+        is re-raised once all clones have finished.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [
+                pool.submit(self.ensure_cloned, org, repo_name, base_dir,
+                            depth=depth, recurse_submodules=recurse_submodules, jobs=jobs,
+                            single_branch=single_branch, filter_blobs=filter_blobs)
+                for org, repo_name, base_dir in specs
+            ]
+        return [future.result() for future in futures]
+
     def switch_or_create_branch(self, branch: str, push: bool = False):
         """Switch to a branch, or create it (and optionally push to origin) if it doesn't exist."""
-        try:
+        # Decide up front instead of letting a failed checkout tell us; a branch that only
+        # exists on origin is still checked out so git sets up tracking for it
+        if self.branch_exists(branch) or self.object_exists(f"refs/remotes/origin/{branch}"):
             self._run_git(["checkout", branch])
-        except subprocess.CalledProcessError:
-            logging.info(f"Branch {branch} does not exist. Creating it.")
+        else:
+            logging.info("Branch %s does not exist. Creating it.", branch)
             self._run_git(["checkout", "-b", branch])
             if push:
-                self._run_git(["push", "--set-upstream", "origin", branch])
+                self._run_git(["push", "--set-upstream", "origin", branch],
+                              env=self._network_env())
 
     def add_commit_push(self, files: List[str], message: str, push: bool = False):
         """Add files, commit with message, and optionally push to origin."""
-        self._run_git(["add"] + files)
+        self._run_git(["add", "--"] + files)
         self._run_git(["commit", "-m", message])
         if push:
-            self._run_git(["push"])
+            self._run_git(["push"], env=self._network_env())
 
-    def branch_exists(self, branch: str) -> bool:
+    def _ensure_batch_proc(self) -> subprocess.Popen:
+        """Return the long-running git cat-file --batch-check process, starting it if needed.
+
+        Callers must hold self._batch_lock.
+        """
+        if self._batch_proc is None or self._batch_proc.poll() is not None:
+            self._batch_proc = subprocess.Popen(
+                ["git", "cat-file", "--batch-check"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+            atexit.register(self.close)
+        return self._batch_proc
+
+    def object_exists(self, rev: str) -> bool:
+        """Check whether rev (a ref name or object id) resolves, without spawning a git process.
+
+        Returns False when repo_path is not a git repository.
+        """
+        with self._batch_lock:
+            proc = self._ensure_batch_proc()
+            try:
+                proc.stdin.write(rev + "\n")
+                proc.stdin.flush()
+                line = proc.stdout.readline()
+            except (BrokenPipeError, ValueError):
+                line = ""
+        if not line:
+            # Outside a repository git exits straight away; nothing can resolve there
+            if not self.is_git_repo():
+                return False
+            raise GoGoGitError(f"git cat-file --batch-check exited while looking up {rev}")
+        return not line.rstrip("\n").endswith(" missing")
+
+    def close(self):
+        """Shut down the persistent git cat-file process, if one is running."""
+        with self._batch_lock:
+            proc, self._batch_proc = self._batch_proc, None
+        if proc is None:
+            return
+        atexit.unregister(self.close)
         try:
-            self._run_git(["show-ref", "--verify", f"refs/heads/{branch}"], capture_output=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+    def branch_exists(self, branch: str) -> bool:
+        return self.object_exists(f"refs/heads/{branch}")
 
     def assert_gh_ready(self):
         if not GoGoGit.is_gh_installed():
             raise GoGoGitError("GitHub CLI (gh) is not installed.")
-        if not GoGoGit.is_gh_copilot_installed():
+        checks = (GoGoGit.is_gh_copilot_installed, GoGoGit.is_gh_authenticated)
+        if all(check.cache_info().currsize for check in checks):
+            copilot_installed, authenticated = (check() for check in checks)
+        else:
+            # Both may have to ask gh, and neither depends on the other
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+                copilot_installed, authenticated = pool.map(lambda check: check(), checks)
+        if not copilot_installed:
             raise GoGoGitError("GitHub Copilot CLI extension is not installed.")
-        if not GoGoGit.is_gh_authenticated():
+        if not authenticated:
             raise GoGoGitError(
                 "No valid GitHub CLI access token detected.\n"
                 "To use GitHub Copilot in the CLI, you must authenticate the GitHub CLI using a personal access token (PAT).\n"
@@ -142,5 +344,11 @@ class GoGoGit:
 
     def apply_patch(self, patch_file):
         """Apply a patch file to the repository using git apply."""
-        logging.info(f"Applying patch file: {patch_file}")
+        logging.info("Applying patch file: %s", patch_file)
         return self._run_git(['apply', patch_file])
+
+    def apply_patch_stdin(self, patch: Union[str, bytes], index: bool = False):
+        """Apply patch content to the repository by piping it to git apply.
+        With index=True the change is staged as well (git apply --index)."""
+        logging.info("Applying patch from stdin (%d bytes)", len(patch))
+        return self._run_git(['apply'] + (['--index'] if index else []) + ['-'], input=patch)
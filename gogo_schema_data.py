@@ -0,0 +1,62 @@
+# Generated by tools/build_schema.py from structured_proposal_response.schema.json.
+# Do not edit; change the JSON schema and re-run the tool instead.
+
+# JSON literals, so that SCHEMA can be written as json.dumps output
+true, false, null = True, False, None
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "title": "StructuredProposalResponse",
+    "description": "A JSON-LD object representing a Structured Proposal Response for code automation. Contains a git patch, explanatory text, errors, install instructions, tool attribution, and a commit message, with all fields following the repository's specification for automated code proposals.",
+    "type": "object",
+    "properties": {
+        "@context": {
+            "type": "string",
+            "description": "The JSON-LD context URI, typically 'https://schema.org'. Required for Linked Data compliance.",
+            "default": "https://schema.org"
+        },
+        "version": {
+            "type": "string",
+            "description": "Version of the Structured Proposal Response format, following SEMVER. Default is 'v0.1'.",
+            "default": "v0.1"
+        },
+        "patch": {
+            "type": "string",
+            "description": "A required string containing a git patch that can be applied to the codebase. Must be in standard patch/diff format."
+        },
+        "explanation": {
+            "type": "string",
+            "description": "Optional markdown-formatted text explaining the reasoning or steps behind the proposed patch."
+        },
+        "errors": {
+            "type": "array",
+            "description": "Optional array of error or warning messages explaining what prevented fully fulfilling the request.",
+            "items": {
+                "type": "string"
+            }
+        },
+        "install": {
+            "type": "array",
+            "description": "Optional array of instructions for the user to perform before or after installing the patch (e.g., move/delete files).",
+            "items": {
+                "type": "string"
+            }
+        },
+        "gadget": {
+            "type": "string",
+            "description": "A required string identifying the LLM/service/tool that generated this response. Should be as specific as possible (e.g., 'OpenAI GPT-4 via GitHub Copilot')."
+        },
+        "commit_message": {
+            "type": "string",
+            "description": "A required string for the proposed git commit message. Must indicate if it fixes any issues, attribute the tool and contributors, and thank the open source community."
+        }
+    },
+    "required": [
+        "@context",
+        "patch",
+        "gadget",
+        "commit_message"
+    ]
+}
+
+del true, false, null
@@ -1,141 +1,434 @@
+import hashlib
 import json
 import jsonschema
-from jsonschema import validate
+from jsonschema.validators import validator_for
 import os
 import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from gogo_git import GoGoGit
 
+try:
+    import jsonschema_rs
+except ImportError:
+    jsonschema_rs = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set (to any non-empty value) to validate with jsonschema even if jsonschema_rs or
+# fastjsonschema is installed
+FORCE_JSONSCHEMA_ENV = "GOGO_FORCE_JSONSCHEMA"
+
 # Configure logging for this module
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+def _loads(data):
+    """Deserialize JSON from str or bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps(obj):
+    """Serialize obj as JSON text indented by two spaces, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, indent=2)
+
+# GoGoGit keeps no per-command state (its cat-file helper is behind a lock), so one
+# instance per repository can safely be shared between threads. Least recently used first.
+_GIT_CACHE_SIZE = 32
+_GIT_CACHE = OrderedDict()
+_GIT_CACHE_LOCK = threading.Lock()
+
+def _immutable_text(json_str):
+    """Return json_str, copied to bytes if it is a bytearray the caller could still change."""
+    return bytes(json_str) if isinstance(json_str, bytearray) else json_str
+
+def _get_git(repo_path):
+    """Return the shared GoGoGit for repo_path, creating it on first use.
+
+    At most _GIT_CACHE_SIZE instances are kept. The least recently used one is closed,
+    shutting down its git cat-file helper, when another repository needs the slot.
+    """
+    key = os.path.realpath(repo_path)
+    evicted = None
+    with _GIT_CACHE_LOCK:
+        g = _GIT_CACHE.get(key)
+        if g is not None:
+            _GIT_CACHE.move_to_end(key)
+            return g
+        g = _GIT_CACHE[key] = GoGoGit(key)
+        if len(_GIT_CACHE) > _GIT_CACHE_SIZE:
+            _, evicted = _GIT_CACHE.popitem(last=False)
+    if evicted is not None:
+        evicted.close()
+    return g
+
+# Source paths of renames in a git diff; git apply --numstat only reports the new name
+_RENAME_FROM_RE = re.compile(rb"^rename from ([^\r\n]+)", re.MULTILINE)
+
+# Escapes git uses in C-style quoted paths, besides three-digit octal bytes
+_C_ESCAPES = {ord('a'): 7, ord('b'): 8, ord('t'): 9, ord('n'): 10, ord('v'): 11,
+              ord('f'): 12, ord('r'): 13, ord('"'): 34, ord('\\'): 92}
+
+def _unquote_git_path(path):
+    """Undo git's C-style quoting of a path (bytes), as used for unusual file names."""
+    if len(path) < 2 or path[:1] != b'"' or path[-1:] != b'"':
+        return path
+    out = bytearray()
+    i, end = 1, len(path) - 1
+    while i < end:
+        c = path[i]
+        if c != 0x5c or i + 1 >= end:
+            out.append(c)
+            i += 1
+        elif 0x30 <= path[i + 1] <= 0x37:
+            out.append(int(path[i + 1:i + 4], 8))
+            i += 4
+        else:
+            out.append(_C_ESCAPES.get(path[i + 1], path[i + 1]))
+            i += 2
+    return bytes(out)
+
+def _patch_paths(g, patch):
+    """Return every path patch touches, as git itself parses them, or None if git cannot read it.
+
+    Covers modified, added and deleted files and both sides of renames; names with spaces
+    or quoted non-ASCII characters come back exactly as they are on disk.
+    """
+    if isinstance(patch, str):
+        patch = patch.encode('utf-8')
+    result = g._run_git(['apply', '--numstat', '-z', '-'], check=False, capture_output=True,
+                        input=patch)
+    if result.returncode != 0:
+        return None
+    # -z records are "added<TAB>deleted<TAB>path<NUL>", with the path left unquoted
+    paths = {record.split(b'\t', 2)[2] for record in result.stdout.split(b'\0') if record}
+    paths.update(_unquote_git_path(m) for m in _RENAME_FROM_RE.findall(patch))
+    return sorted(os.fsdecode(path) for path in paths)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'structured_proposal_response.schema.json')
 
 class StructuredProposalResponseError(Exception):
     pass
 
+def _compile_fast_validator(schema):
+    """Compile schema with the fastest installed backend: jsonschema_rs, then fastjsonschema.
+
+    Returns a function that raises jsonschema's ValidationError for invalid data, or None
+    when neither backend is installed or jsonschema is forced.
+    """
+    if os.environ.get(FORCE_JSONSCHEMA_ENV):
+        return None
+    if jsonschema_rs is not None:
+        # validator_for replaced JSONSchema in newer jsonschema_rs releases
+        build = getattr(jsonschema_rs, 'validator_for', None) or jsonschema_rs.JSONSchema
+        rs_validator = build(schema)
+
+        def validate_rs(data):
+            try:
+                rs_validator.validate(data)
+            except jsonschema_rs.ValidationError as e:
+                raise jsonschema.exceptions.ValidationError(e.message)
+        return validate_rs
+    if fastjsonschema is not None:
+        compiled = fastjsonschema.compile(schema)
+
+        def validate_fast(data):
+            try:
+                compiled(data)
+            except fastjsonschema.JsonSchemaValueException as e:
+                raise jsonschema.exceptions.ValidationError(e.message)
+        return validate_fast
+    return None
+
+# (jsonschema validator, compiled validation function or None) by schema digest, so an
+# equal schema, from whatever file or dict it was loaded, is only ever compiled once
+_VALIDATOR_CACHE = {}
+
+def _schema_digest(schema):
+    return hashlib.blake2b(json.dumps(schema, sort_keys=True).encode('utf-8')).digest()
+
+def _get_validators(schema):
+    """Return the (jsonschema validator, compiled validation function or None) for schema,
+    checking and compiling it only the first time an equal schema is seen."""
+    key = _schema_digest(schema)
+    validators = _VALIDATOR_CACHE.get(key)
+    if validators is None:
+        validator_cls = validator_for(schema)
+        validator_cls.check_schema(schema)
+        validators = (validator_cls(schema), _compile_fast_validator(schema))
+        validators = _VALIDATOR_CACHE.setdefault(key, validators)
+    return validators
+
+def _read_schema():
+    """Return the proposal schema, preferring the literal generated by tools/build_schema.py
+    (no file read or JSON parse) and falling back to the JSON file it is generated from."""
+    try:
+        from gogo_schema_data import SCHEMA
+    except ImportError:
+        logger.info("Loading schema from %s", SCHEMA_PATH)
+        with open(SCHEMA_PATH, 'r') as f:
+            return json.load(f)
+    logger.info("Using schema from gogo_schema_data")
+    return SCHEMA
+
+def _load_schema_and_validators():
+    """Read the proposal schema and build its validators, checking the schema once.
+
+    Returns (schema, jsonschema validator, compiled validation function or None).
+    """
+    try:
+        schema = _read_schema()
+        validator, fast_validate = _get_validators(schema)
+    except Exception as e:
+        logger.error("Failed to load schema: %s", e)
+        raise StructuredProposalResponseError(f"Could not load schema: {e}")
+    logger.info("Schema loaded successfully.")
+    return schema, validator, fast_validate
+
+# Loaded at import, so constructing a response never has to check for or load the schema
+_SCHEMA, _VALIDATOR, _FAST_VALIDATE = _load_schema_and_validators()
+
 class StructuredProposalResponse:
-    _schema = None
+    # _raw is the JSON text the instance was parsed from, cleared as soon as the
+    # parsed data may have been changed; until then to_json returns it as is
+    __slots__ = ('_data', '_raw')
 
     @classmethod
     def load_schema(cls):
-        if cls._schema is None:
-            schema_path = os.path.join(os.path.dirname(__file__), 'structured_proposal_response.schema.json')
-            logger.info(f"Loading schema from {schema_path}")
-            try:
-                with open(schema_path, 'r') as f:
-                    cls._schema = json.load(f)
-                logger.info("Schema loaded successfully.")
-            except Exception as e:
-                logger.error(f"Failed to load schema: {e}")
-                raise StructuredProposalResponseError(f"Could not load schema: {e}")
-        return cls._schema
+        """Return the proposal schema (loaded once, when this module is imported)."""
+        return _SCHEMA
 
     def __init__(self, json_str):
         logger.info("Initializing StructuredProposalResponse instance.")
+        self._data = self._parse(json_str)
+        self._check(self._data)
+        self._raw = _immutable_text(json_str)
+
+    @classmethod
+    def validate_many(cls, json_strs, max_workers=None):
+        """Parse and validate several proposals, returning a response for each, in order.
+
+        All inputs are parsed first; validation then runs on a thread pool using the one
+        compiled validator, which overlaps on multiple cores when the validation backend
+        releases the GIL. The first invalid input raises StructuredProposalResponseError.
+        """
+        json_strs = list(json_strs)
+        docs = [cls._parse(json_str) for json_str in json_strs]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for _ in pool.map(cls._check, docs):
+                pass
+        return [cls._from_parsed(data, _immutable_text(json_str))
+                for data, json_str in zip(docs, json_strs)]
+
+    @classmethod
+    def _from_parsed(cls, data, raw=None):
+        """Wrap proposal data that was already parsed (and validated, if needed) as a response.
+
+        raw, if given, is the JSON text data was parsed from.
+        """
+        self = cls.__new__(cls)
+        self._data = data
+        self._raw = raw
+        return self
+
+    @property
+    def data(self):
+        """The parsed proposal. Since callers may change it in place, the original JSON
+        text is no longer reused by to_json once this has been accessed."""
+        self._raw = None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._raw = None
+
+    def _get(self, key, default=None):
+        value = self._data.get(key, default)
+        if isinstance(value, (dict, list)):
+            # The caller may change it in place
+            self._raw = None
+        return value
+
+    def _set(self, key, value):
+        self._data[key] = value
+        self._raw = None
+
+    @staticmethod
+    def _parse(json_str):
         try:
-            self.data = json.loads(json_str)
-            logger.debug(f"Parsed JSON: {self.data}")
+            data = _loads(json_str)
         except Exception as e:
-            logger.error(f"Invalid JSON input: {e}")
+            logger.error("Invalid JSON input: %s", e)
             raise StructuredProposalResponseError(f"Invalid JSON: {e}")
-        schema = self.load_schema()
+        if logger.isEnabledFor(logging.DEBUG) and isinstance(data, dict):
+            logger.debug("Parsed JSON with %d fields", len(data))
+        return data
+
+    @classmethod
+    def _check(cls, data):
         try:
-            validate(instance=self.data, schema=schema)
+            cls._validate(data)
             logger.info("JSON validated successfully against schema.")
         except jsonschema.exceptions.ValidationError as e:
-            logger.error(f"JSON does not comply with StructuredProposalResponse schema: {e}")
+            logger.error("JSON does not comply with StructuredProposalResponse schema: %s", e)
             raise StructuredProposalResponseError(f"JSON does not comply with StructuredProposalResponse schema: {e}")
 
+    @classmethod
+    def from_stream(cls, fp, fields=('patch', 'commit_message')):
+        """Build a response from a file object holding proposal JSON, keeping only the
+        top-level fields named in fields.
+
+        The document is parsed incrementally with ijson and reading stops as soon as every
+        requested field has been seen, so memory grows with those fields rather than with
+        the whole document. The result is not validated against the schema, since most of
+        the document is never looked at; requested fields the document lacks are absent.
+        """
+        try:
+            import ijson
+        except ImportError:
+            raise ImportError("Install ijson: pip install ijson")
+        wanted = set(fields)
+        data = {}
+        try:
+            for key, value in ijson.kvitems(fp, ''):
+                if key in wanted:
+                    data[key] = value
+                    if len(data) == len(wanted):
+                        break
+        except ijson.JSONError as e:
+            logger.error("Invalid JSON input: %s", e)
+            raise StructuredProposalResponseError(f"Invalid JSON: {e}")
+        return cls._from_parsed(data)
+
+    @staticmethod
+    def _validate(data):
+        """Validate data against the loaded schema, raising on the first violation.
+
+        Uses the compiled jsonschema_rs / fastjsonschema validator when available,
+        else jsonschema.
+        """
+        if _FAST_VALIDATE is not None:
+            _FAST_VALIDATE(data)
+        else:
+            _VALIDATOR.validate(data)
+
     def apply_patch(self, repo_path):
-        patch_content = self.data['patch']
-        patch_file = os.path.join(repo_path, '.gogo_patch.diff')
-        logger.info(f"Writing patch to {patch_file}")
+        patch_content = self._data['patch']
+        logger.info("Applying patch to repository at %s", repo_path)
         try:
-            with open(patch_file, 'w') as f:
-                f.write(patch_content)
-            logger.info("Patch file written. Applying patch to repository.")
-            g = GoGoGit(repo_path)
-            result = g.apply_patch(patch_file)
+            g = _get_git(repo_path)
+            result = g.apply_patch_stdin(patch_content)
             logger.info("Patch applied successfully.")
         except Exception as e:
-            logger.error(f"Failed to apply patch: {e}")
+            logger.error("Failed to apply patch: %s", e)
             raise StructuredProposalResponseError(f"Failed to apply patch: {e}")
-        finally:
-            if os.path.exists(patch_file):
-                os.remove(patch_file)
-                logger.info(f"Removed temporary patch file: {patch_file}")
         return result
 
     def commit(self, repo_path):
-        commit_message = self.data['commit_message']
-        logger.info(f"Committing changes to repo at {repo_path} with message: {commit_message}")
+        commit_message = self._data['commit_message']
+        logger.info("Committing changes to repo at %s with message: %s", repo_path, commit_message)
         try:
-            g = GoGoGit(repo_path)
-            g._run_git(['add', '-A'])
+            g = _get_git(repo_path)
+            # Stage just the paths the patch touches (including deletions and rename
+            # sources) rather than making git add -A rescan the whole working tree
+            paths = _patch_paths(g, self._data.get('patch') or '')
+            if paths:
+                g._run_git(['add', '-A', '--'] + paths)
+            else:
+                g._run_git(['add', '-A'])
             result = g._run_git(['commit', '-m', commit_message])
             logger.info("Commit successful.")
         except Exception as e:
-            logger.error(f"Failed to commit changes: {e}")
+            logger.error("Failed to commit changes: %s", e)
             raise StructuredProposalResponseError(f"Failed to commit changes: {e}")
         return result
 
+    def apply_and_commit(self, repo_path):
+        """Apply the patch to the working tree and index in one step, then commit it.
+
+        git apply --index stages exactly what the patch changes, so no separate git add
+        pass is needed. It refuses to run if the touched files differ from the index.
+        """
+        commit_message = self._data['commit_message']
+        logger.info("Applying and committing patch in repo at %s with message: %s",
+                    repo_path, commit_message)
+        try:
+            g = _get_git(repo_path)
+            g.apply_patch_stdin(self._data['patch'], index=True)
+            result = g._run_git(['commit', '-m', commit_message])
+            logger.info("Patch applied and committed successfully.")
+        except Exception as e:
+            logger.error("Failed to apply and commit patch: %s", e)
+            raise StructuredProposalResponseError(f"Failed to apply and commit patch: {e}")
+        return result
+
     # Getter and setter methods for all fields
     def get_patch(self):
-        logger.debug("Getting patch field.")
-        return self.data.get('patch')
+        return self._get('patch')
 
     def set_patch(self, patch):
-        logger.debug("Setting patch field.")
-        self.data['patch'] = patch
+        self._set('patch', patch)
 
     def get_explanation(self):
-        logger.debug("Getting explanation field.")
-        return self.data.get('explanation')
+        return self._get('explanation')
 
     def set_explanation(self, explanation):
-        logger.debug("Setting explanation field.")
-        self.data['explanation'] = explanation
+        self._set('explanation', explanation)
 
     def get_errors(self):
-        logger.debug("Getting errors field.")
-        return self.data.get('errors')
+        return self._get('errors')
 
     def set_errors(self, errors):
-        logger.debug("Setting errors field.")
-        self.data['errors'] = errors
+        self._set('errors', errors)
 
     def get_install(self):
-        logger.debug("Getting install field.")
-        return self.data.get('install')
+        return self._get('install')
 
     def set_install(self, instr):
-        logger.debug("Setting install field.")
-        self.data['install'] = instr
+        self._set('install', instr)
 
     def get_gadget(self):
-        logger.debug("Getting gadget field.")
-        return self.data.get('gadget')
+        return self._get('gadget')
 
     def set_gadget(self, gadget):
-        logger.debug("Setting gadget field.")
-        self.data['gadget'] = gadget
+        self._set('gadget', gadget)
 
     def get_commit_message(self):
-        logger.debug("Getting commit_message field.")
-        return self.data.get('commit_message')
+        return self._get('commit_message')
 
     def set_commit_message(self, msg):
-        logger.debug("Setting commit_message field.")
-        self.data['commit_message'] = msg
+        self._set('commit_message', msg)
 
     def get_version(self):
-        logger.debug("Getting version field.")
-        return self.data.get('version', 'v0.1')
+        return self._get('version', 'v0.1')
 
     def set_version(self, version):
-        logger.debug("Setting version field.")
-        self.data['version'] = version
+        self._set('version', version)
 
     def to_json(self):
+        """Return the response as JSON text.
+
+        This is the JSON the instance was created from, without re-serializing, until its
+        data may have changed: a set_* call, any access to data, or a getter returning a
+        list or object. After that self.data is serialized with two-space indentation.
+        """
+        if self._raw is not None:
+            if isinstance(self._raw, bytes):
+                return self._raw.decode('utf-8')
+            return self._raw
         logger.debug("Serializing StructuredProposalResponse to JSON.")
-        return json.dumps(self.data, indent=2)
\ No newline at end of file
+        return _dumps(self._data)
\ No newline at end of file
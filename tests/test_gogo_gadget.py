@@ -0,0 +1,43 @@
+import io
+import json
+import unittest
+
+from gogo_gadget import read_fenced_json
+
+
+def read(text: str) -> str:
+    return read_fenced_json(io.BytesIO(text.encode("utf-8")))
+
+
+class ReadFencedJsonTest(unittest.TestCase):
+    def test_block_between_prose(self):
+        self.assertEqual(json.loads(read('Plan:\n```json\n{"a": 1}\n```\nDone {x}\n')), {"a": 1})
+
+    def test_block_on_one_line(self):
+        self.assertEqual(json.loads(read('```json {"a": 1} ```\n')), {"a": 1})
+
+    def test_indented_block(self):
+        text = '1. Fix:\n   ```json\n   {"a": 1}\n   ```\nnote {x}\n'
+        self.assertEqual(json.loads(read(text)), {"a": 1})
+
+    def test_fence_after_prose_on_same_line(self):
+        self.assertEqual(json.loads(read('Here: ```json\n{"a": 1}``` thanks\n')), {"a": 1})
+
+    def test_stops_reading_after_block(self):
+        # GoGoCopilot drains whatever follows the block itself
+        stream = io.BytesIO(b'```json {"a": 1} ```\nafter\n')
+        self.assertEqual(json.loads(read_fenced_json(stream)), {"a": 1})
+        self.assertEqual(stream.read(), b"after\n")
+
+    def test_unclosed_block(self):
+        self.assertEqual(json.loads(read('```json\n{"a": 1}\n')), {"a": 1})
+
+    def test_no_fence_trims_to_braces(self):
+        self.assertEqual(read('Sure: {"a": {"b": 2}} done.'), '{"a": {"b": 2}}')
+
+    def test_no_json_returned_unchanged(self):
+        self.assertEqual(read("no json at all\n"), "no json at all\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
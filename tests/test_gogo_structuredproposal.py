@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from gogo_structuredproposal import StructuredProposalResponse
+
+PROPOSAL = {
+    "@context": "https://example.org/context",
+    "patch": "diff --git a/x b/x\n",
+    "gadget": "gogo",
+    "commit_message": "Fix x",
+    "errors": ["first"],
+}
+
+
+class ToJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.source = json.dumps(PROPOSAL)
+        self.response = StructuredProposalResponse(self.source)
+
+    def test_unchanged_returns_source(self):
+        self.response.get_patch()
+        self.assertIs(self.response.to_json(), self.source)
+
+    def test_setter_is_serialized(self):
+        self.response.set_commit_message("Fix y")
+        self.assertEqual(json.loads(self.response.to_json())["commit_message"], "Fix y")
+
+    def test_change_through_data_is_serialized(self):
+        self.response.data["patch"] = ""
+        self.assertEqual(json.loads(self.response.to_json())["patch"], "")
+
+    def test_change_to_returned_list_is_serialized(self):
+        self.response.get_errors().append("second")
+        self.assertEqual(json.loads(self.response.to_json())["errors"], ["first", "second"])
+
+    def test_source_bytearray_is_copied(self):
+        source = bytearray(self.source.encode("utf-8"))
+        response = StructuredProposalResponse(source)
+        source[:] = b"{}"
+        self.assertEqual(json.loads(response.to_json()), PROPOSAL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Generate gogo_schema_data.py from structured_proposal_response.schema.json.
+
+The generated module holds the proposal schema as a Python literal, so importing
+gogo_structuredproposal needs no file read or JSON parse for it. Re-run after
+editing the schema; --check exits non-zero if the generated module is out of date.
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_JSON = os.path.join(ROOT, 'structured_proposal_response.schema.json')
+SCHEMA_MODULE = os.path.join(ROOT, 'gogo_schema_data.py')
+
+HEADER = (
+  '# Generated by tools/build_schema.py from structured_proposal_response.schema.json.\n'
+  '# Do not edit; change the JSON schema and re-run the tool instead.\n'
+)
+
+
+def render(schema: dict) -> str:
+  """Return the source of the generated module for schema.
+
+  The schema is written as json.dumps output, whose layout is fixed by the JSON format
+  rather than by the running Python's pprint, so --check gives the same answer on every
+  Python version. Binding true, false and null makes that text a Python expression.
+  """
+  literal = json.dumps(schema, indent=4, ensure_ascii=False)
+  return (
+    f"{HEADER}\n"
+    "# JSON literals, so that SCHEMA can be written as json.dumps output\n"
+    "true, false, null = True, False, None\n\n"
+    f"SCHEMA = {literal}\n\n"
+    "del true, false, null\n"
+  )
+
+
+def main() -> int:
+  """Write the generated module, or with --check compare it against the schema.
+
+  Returns:
+      int: Exit status; 1 if --check found the module out of date, else 0.
+  """
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--check', action='store_true',
+                      help="Only report whether the generated module is up to date.")
+  args = parser.parse_args()
+
+  with open(SCHEMA_JSON, 'r', encoding='utf-8') as f:
+    source = render(json.load(f))
+
+  if args.check:
+    try:
+      with open(SCHEMA_MODULE, 'r', encoding='utf-8') as f:
+        current = f.read()
+    except FileNotFoundError:
+      current = None
+    if current != source:
+      print(f"{os.path.relpath(SCHEMA_MODULE, ROOT)} is out of date; run tools/build_schema.py",
+            file=sys.stderr)
+      return 1
+    return 0
+
+  with open(SCHEMA_MODULE, 'w', encoding='utf-8') as f:
+    f.write(source)
+  print(f"Wrote {os.path.relpath(SCHEMA_MODULE, ROOT)}")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())